@@ -0,0 +1,323 @@
+"""Static asset pipeline.
+
+Run ``python assets.py`` to vendor the CDN libraries and web fonts into
+``static/vendor``, copy every static file into ``static/dist`` under a
+content-hashed name and write gzip/brotli variants next to them.  When the manifest produced by the
+build is present, ``init_app`` makes ``url_for('static', ...)`` point at the
+fingerprinted files, serves them with long-lived cache headers and picks the
+precompressed variant the browser accepts.  Without a build the app keeps
+using the CDNs and the plain files in ``static/``.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import urllib.request
+
+from flask import abort, request, send_file, url_for
+from werkzeug.utils import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+
+# Local path (relative to static/) -> pinned CDN URL
+VENDOR_ASSETS = {
+    "vendor/bootstrap/css/bootstrap.min.css": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css",
+    "vendor/bootstrap/js/bootstrap.bundle.min.js": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js",
+    "vendor/fontawesome/css/all.min.css": "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css",
+    "vendor/chartjs/chart.umd.min.js": "https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.min.js",
+    "vendor/fonts/fonts.css": "https://fonts.googleapis.com/css2?family=Playfair+Display:wght@400;700&family=Poppins:wght@300;400;500;600&display=swap",
+}
+
+# Google Fonts picks the font format from the User-Agent, this one gets woff2
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+# Files referenced from inside the vendored CSS (not linked from templates)
+for _font in ("fa-solid-900", "fa-regular-400", "fa-brands-400", "fa-v4compatibility"):
+    for _ext in ("woff2", "ttf"):
+        VENDOR_ASSETS[f"vendor/fontawesome/webfonts/{_font}.{_ext}"] = (
+            f"https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/webfonts/{_font}.{_ext}"
+        )
+
+# User uploads change at runtime, and dist/ is the build output itself
+SKIP_DIRS = {"uploads", "dist"}
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".ttf", ".json", ".html", ".txt"}
+COMPRESSIBLE_MIMETYPES = {"text/html", "application/json"}
+MIN_COMPRESS_SIZE = 500
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+?)\1\s*\)""")
+
+
+# Build
+def download(url, target):
+    print(f"Downloading {url}")
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        data = response.read()
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as f:
+        f.write(data)
+    return data
+
+
+def localize_font_css(target, data):
+    # Fetch the font files the stylesheet links to and reference local copies
+    css = data.decode("utf-8")
+    for url in sorted(set(re.findall(r"url\((https://fonts\.gstatic\.com/s/[^)]+)\)", css))):
+        path = "files/" + url.split("/s/", 1)[1]
+        download(url, os.path.join(os.path.dirname(target), path))
+        css = css.replace(url, path)
+    with open(target, "w", encoding="utf-8") as f:
+        f.write(css)
+
+
+def vendor_assets():
+    for path, url in VENDOR_ASSETS.items():
+        target = os.path.join(STATIC_DIR, path)
+        if os.path.exists(target):
+            continue
+        data = download(url, target)
+        if url.startswith("https://fonts.googleapis.com/"):
+            localize_font_css(target, data)
+
+
+def rewrite_css_urls(path, data, manifest):
+    # Point relative url(...) references at the fingerprinted files
+    base = posixpath.dirname(path)
+    served_dir = posixpath.dirname("dist/" + path)
+
+    def replace(match):
+        quote, ref = match.group(1), match.group(2)
+        clean = re.split(r"[?#]", ref, maxsplit=1)[0]
+        target = posixpath.normpath(posixpath.join(base, clean))
+        if ":" in ref or ref.startswith("/") or target not in manifest:
+            return match.group(0)
+        hashed = posixpath.relpath(manifest[target], served_dir)
+        return f"url({quote}{hashed}{ref[len(clean):]}{quote})"
+
+    return CSS_URL.sub(replace, data.decode("utf-8")).encode("utf-8")
+
+
+def fingerprint(path, data):
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    root, ext = os.path.splitext(path)
+    return f"{root}.{digest}{ext}"
+
+
+def write_compressed(path, data):
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    sizes = {"gzip": os.path.getsize(path + ".gz")}
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(data, quality=11))
+        sizes["br"] = os.path.getsize(path + ".br")
+    return sizes
+
+
+def prune(manifest):
+    # Hashed files from earlier builds that the new manifest no longer uses
+    keep = set(manifest.values())
+    removed = 0
+    for root, dirs, files in os.walk(DIST_DIR):
+        for name in files:
+            target = os.path.join(root, name)
+            path = os.path.relpath(target, STATIC_DIR).replace(os.sep, "/")
+            base = path[:-3] if path.endswith((".gz", ".br")) else path
+            if target != MANIFEST_PATH and base not in keep:
+                os.remove(target)
+                removed += 1
+    print(f"Pruned {removed} files from earlier builds")
+
+
+def build(prune_old=False):
+    vendor_assets()
+
+    sources = []
+    for root, dirs, files in os.walk(STATIC_DIR):
+        rel_root = os.path.relpath(root, STATIC_DIR)
+        if rel_root == ".":
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in files:
+            path = os.path.normpath(os.path.join(rel_root, name)).replace(os.sep, "/")
+            sources.append(path)
+    # Stylesheets last, so the files they reference are already hashed
+    sources.sort(key=lambda path: path.endswith(".css"))
+
+    manifest = {}
+    totals = {"raw": 0, "gzip": 0, "br": 0}
+    for path in sources:
+        with open(os.path.join(STATIC_DIR, path), "rb") as f:
+            data = f.read()
+        if path.endswith(".css"):
+            data = rewrite_css_urls(path, data, manifest)
+
+        hashed = "dist/" + fingerprint(path, data)
+        manifest[path] = hashed
+
+        target = os.path.join(STATIC_DIR, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(data)
+        if os.path.splitext(path)[1] in COMPRESSIBLE_EXTENSIONS:
+            sizes = write_compressed(target, data)
+        else:
+            sizes = {}
+
+        totals["raw"] += len(data)
+        totals["gzip"] += sizes.get("gzip", len(data))
+        totals["br"] += sizes.get("br", sizes.get("gzip", len(data)))
+
+    # Running apps and cached pages still reference earlier hashes, so those
+    # files stay until an explicit --prune and the manifest is swapped last
+    os.makedirs(DIST_DIR, exist_ok=True)
+    with open(MANIFEST_PATH + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(MANIFEST_PATH + ".tmp", MANIFEST_PATH)
+
+    if prune_old:
+        prune(manifest)
+
+    print(f"Fingerprinted {len(manifest)} files into {DIST_DIR}")
+    print(f"Total bytes: {totals['raw']} raw, {totals['gzip']} gzip", end="")
+    print(f", {totals['br']} brotli" if brotli is not None else "")
+    return manifest
+
+
+# Serving
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def stale_entries(manifest):
+    # Sources edited or removed since the last build
+    stale = []
+    for path, hashed in manifest.items():
+        try:
+            with open(os.path.join(STATIC_DIR, path), "rb") as f:
+                data = f.read()
+        except OSError:
+            stale.append(path)
+            continue
+        if path.endswith(".css"):
+            data = rewrite_css_urls(path, data, manifest)
+        if "dist/" + fingerprint(path, data) != hashed:
+            stale.append(path)
+    return stale
+
+
+def accepted_encoding(path):
+    for encoding, ext in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[encoding] and os.path.isfile(path + ext):
+            return encoding, path + ext
+    return None, path
+
+
+def compress_response(response):
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+
+    if brotli is not None and request.accept_encodings["br"]:
+        response.set_data(brotli.compress(data, quality=5))
+        response.headers["Content-Encoding"] = "br"
+    elif request.accept_encodings["gzip"]:
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        return response
+
+    # The encoded body differs byte-for-byte, so a strong ETag no longer fits
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def init_app(app):
+    manifest = load_manifest()
+    stale = stale_entries(manifest)
+    if stale:
+        app.logger.warning(
+            "Static files changed since the last asset build, serving them "
+            "unfingerprinted (re-run `python assets.py`): %s",
+            ", ".join(sorted(stale)),
+        )
+        for path in stale:
+            del manifest[path]
+    immutable = set(manifest.values())
+
+    @app.url_defaults
+    def fingerprinted_static_url(endpoint, values):
+        if endpoint == "static" and values.get("filename") in manifest:
+            values["filename"] = manifest[values["filename"]]
+
+    @app.template_global()
+    def asset_url(path):
+        # Local copy when the build vendored it, otherwise the CDN
+        if path in manifest:
+            return url_for("static", filename=path)
+        return VENDOR_ASSETS[path]
+
+    def send_static(filename):
+        path = safe_join(app.static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+
+        encoding, served_path = accepted_encoding(path)
+        response = send_file(
+            served_path,
+            mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream",
+            download_name=os.path.basename(path),
+            conditional=True,
+            max_age=app.get_send_file_max_age(filename),
+        )
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        if filename in immutable:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    app.view_functions["static"] = send_static
+    app.after_request(compress_response)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the static assets.")
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="delete hashed files from earlier builds",
+    )
+    build(prune_old=parser.parse_args().prune)
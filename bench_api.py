@@ -0,0 +1,214 @@
+"""Seed the database and load-test the JSON API.
+
+    python bench_api.py seed
+    SECRET_KEY=bench gunicorn -w 4 --threads 8 main:app
+    python bench_api.py run --url http://127.0.0.1:8000
+
+``seed`` fills the configured database with products, a benchmark user and
+orders.  ``run`` logs in as that user and hits the ``/api/v1`` endpoints from
+several client processes over keep-alive connections, then prints requests/sec
+and latency percentiles per endpoint.
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import random
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timedelta
+
+BENCH_PHONE = "+10000000001"
+BENCH_PASSWORD = "bench-password"
+
+
+def seed(products, orders):
+    from werkzeug.security import generate_password_hash
+
+    from main import app, db, Order, OrderItem, Product, User
+
+    with app.app_context():
+        db.create_all()
+
+        user = User.query.filter_by(phone_number=BENCH_PHONE).first()
+        if not user:
+            user = User(
+                phone_number=BENCH_PHONE,
+                first_name="Bench",
+                last_name="User",
+                password_hash=generate_password_hash(BENCH_PASSWORD),
+            )
+            db.session.add(user)
+
+        categories = ["coffee", "tea", "dessert"]
+        for i in range(products):
+            db.session.add(
+                Product(
+                    name=f"Bench item {i}",
+                    description="Seeded for the API benchmark",
+                    price=round(random.uniform(1, 10), 2),
+                    category=categories[i % len(categories)],
+                )
+            )
+        db.session.flush()
+
+        product_ids = [p.id for p in Product.query.all()]
+        for i in range(orders):
+            order = Order(
+                user_id=user.id,
+                date=datetime.utcnow() - timedelta(hours=i),
+                total_price=0,
+                status=random.choice(["pending", "preparing", "ready", "completed"]),
+            )
+            db.session.add(order)
+            db.session.flush()
+            for product_id in random.sample(product_ids, min(3, len(product_ids))):
+                price = round(random.uniform(1, 10), 2)
+                db.session.add(
+                    OrderItem(
+                        order_id=order.id,
+                        product_id=product_id,
+                        quantity=2,
+                        price=price,
+                    )
+                )
+                order.total_price += price * 2
+
+        db.session.commit()
+        order_count = Order.query.filter_by(user_id=user.id).count()
+        print(f"Seeded {products} products and {orders} orders ({order_count} total)")
+
+
+def login(host, port):
+    conn = http.client.HTTPConnection(host, port)
+    body = urllib.parse.urlencode({"phone": BENCH_PHONE, "password": BENCH_PASSWORD})
+    conn.request(
+        "POST",
+        "/login",
+        body,
+        {"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    response = conn.getresponse()
+    response.read()
+    if response.status != 200:
+        raise SystemExit(f"Login failed ({response.status}), run `seed` first")
+    cookie = response.getheader("Set-Cookie").split(";", 1)[0]
+    conn.close()
+    return cookie
+
+
+def order_ids(host, port, cookie):
+    conn = http.client.HTTPConnection(host, port)
+    conn.request("GET", "/api/v1/me/orders?limit=100", headers={"Cookie": cookie})
+    data = json.loads(conn.getresponse().read())
+    conn.close()
+    return [order["id"] for order in data["orders"]]
+
+
+def client_process(host, port, cookie, ids, threads, deadline, results):
+    latencies = {}
+    lock = threading.Lock()
+
+    def worker():
+        conn = http.client.HTTPConnection(host, port)
+        headers = {"Cookie": cookie, "Accept-Encoding": "gzip"}
+        local = {}
+        while time.time() < deadline:
+            # Tablets mostly poll the menu, the app checks order status
+            roll = random.random()
+            if roll < 0.6:
+                name, path = "menu", "/api/v1/menu"
+            elif roll < 0.9:
+                name, path = "order", f"/api/v1/orders/{random.choice(ids)}"
+            else:
+                name, path = "me/orders", "/api/v1/me/orders"
+
+            start = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(host, port)
+                ok = False
+            elapsed = time.perf_counter() - start
+            local.setdefault(name, []).append((elapsed, ok))
+        conn.close()
+        with lock:
+            for name, samples in local.items():
+                latencies.setdefault(name, []).extend(samples)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(latencies)
+
+
+def run(url, processes, threads, duration):
+    parsed = urllib.parse.urlparse(url)
+    host, port = parsed.hostname, parsed.port or 80
+
+    cookie = login(host, port)
+    ids = order_ids(host, port, cookie)
+    if not ids:
+        raise SystemExit("Benchmark user has no orders, run `seed` first")
+
+    results = multiprocessing.Queue()
+    deadline = time.time() + duration
+    clients = [
+        multiprocessing.Process(
+            target=client_process,
+            args=(host, port, cookie, ids, threads, deadline, results),
+        )
+        for _ in range(processes)
+    ]
+    for client in clients:
+        client.start()
+
+    combined = {}
+    for _ in clients:
+        for name, samples in results.get().items():
+            combined.setdefault(name, []).extend(samples)
+    for client in clients:
+        client.join()
+
+    total = sum(len(samples) for samples in combined.values())
+    print(f"{processes} processes x {threads} threads for {duration}s against {url}")
+    print(f"{'endpoint':<12}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for name, samples in sorted(combined.items()):
+        times = sorted(elapsed for elapsed, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        p50 = times[len(times) // 2] * 1000
+        p99 = times[int(len(times) * 0.99)] * 1000
+        print(
+            f"{name:<12}{len(samples):>10}{errors:>8}"
+            f"{len(samples) / duration:>10.0f}{p50:>9.1f}{p99:>9.1f}"
+        )
+    print(f"{'total':<12}{total:>10}{'':>8}{total / duration:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed")
+    seed_parser.add_argument("--products", type=int, default=50)
+    seed_parser.add_argument("--orders", type=int, default=200)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--url", default="http://127.0.0.1:8000")
+    run_parser.add_argument("--processes", type=int, default=4)
+    run_parser.add_argument("--threads", type=int, default=8)
+    run_parser.add_argument("--duration", type=int, default=10)
+
+    args = parser.parse_args()
+    if args.command == "seed":
+        seed(args.products, args.orders)
+    else:
+        run(args.url, args.processes, args.threads, args.duration)
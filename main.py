@@ -7,8 +7,12 @@ from flask import (
     redirect,
     url_for,
     abort,
+    Response,
 )
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, create_engine, or_, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
 
 from flask_login import (
     LoginManager,
@@ -23,18 +27,32 @@ import os
 from datetime import datetime, date, timedelta
 import random
 import re
+import json
+import time
+import hashlib
+import threading
+import sqlite3
+from urllib.parse import quote
 from functools import wraps
 
+import assets
+
 
 app = Flask(__name__)
-app.config["SECRET_KEY"] = os.urandom(24)
+# Set SECRET_KEY when running several workers so they share login sessions
+app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY") or os.urandom(24)
 app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///cafe.db"
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+app.config["API_MENU_CACHE_SECONDS"] = 30
+app.config["API_READ_POOL_SIZE"] = 10
+app.config["API_ORDERS_PAGE_SIZE"] = 20
+app.config["API_ORDERS_MAX_PAGE_SIZE"] = 100
 
 db = SQLAlchemy(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = "login"
+assets.init_app(app)
 
 
 # Database Models
@@ -327,6 +345,17 @@ def admin_required(f):
     return decorated_function
 
 
+# API login required decorator (JSON 401 instead of the login redirect)
+def api_login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({"error": "Authentication required"}), 401
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
 @app.route("/admin/products")
 @login_required
 @admin_required
@@ -348,6 +377,7 @@ def admin_add_product():
         )
         db.session.add(product)
         db.session.commit()
+        invalidate_menu_cache()
         return redirect(url_for("admin_products"))
 
     return render_template("admin/add_product.html")
@@ -547,6 +577,7 @@ def admin_edit_product(product_id):
         product.category = request.form.get("category")
 
         db.session.commit()
+        invalidate_menu_cache()
         return redirect(url_for("admin_products"))
 
     return render_template("admin/edit_product.html", product=product)
@@ -559,6 +590,7 @@ def admin_delete_product(product_id):
     product = Product.query.get_or_404(product_id)
     db.session.delete(product)
     db.session.commit()
+    invalidate_menu_cache()
     return jsonify({"message": "Product deleted successfully"})
 
 
@@ -648,10 +680,198 @@ def toggle_product_stock(product_id):
     product = Product.query.get_or_404(product_id)
     product.in_stock = in_stock
     db.session.commit()
+    invalidate_menu_cache()
 
     return jsonify({"message": "Stock status updated successfully"})
 
 
+# JSON API (read-only)
+read_only_engine = None
+read_only_engine_lock = threading.Lock()
+# (body, etag, expires) for /api/v1/menu, or None when it has to be rebuilt
+menu_cache = None
+# Bumped on every invalidation so a rebuild that raced with one is not stored
+menu_generation = 0
+menu_cache_lock = threading.Lock()
+
+
+def get_read_only_engine():
+    # Separate pool opened read-only so API reads never take write locks
+    global read_only_engine
+    if read_only_engine is None:
+        with read_only_engine_lock:
+            if read_only_engine is None:
+                url = db.engine.url
+                if url.get_backend_name() == "sqlite":
+                    # The path is quoted since it becomes part of a file: URI
+                    uri = f"file:{quote(url.database)}?mode=ro"
+                    read_only_engine = create_engine(
+                        "sqlite://",
+                        creator=lambda: sqlite3.connect(
+                            uri, uri=True, check_same_thread=False
+                        ),
+                        poolclass=QueuePool,
+                        pool_size=app.config["API_READ_POOL_SIZE"],
+                    )
+                else:
+                    read_only_engine = db.engine
+    return read_only_engine
+
+
+def invalidate_menu_cache():
+    # Only clears this worker's copy, other workers catch up after the TTL
+    global menu_cache, menu_generation
+    with menu_cache_lock:
+        menu_generation += 1
+        menu_cache = None
+
+
+def dump_json(data):
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def api_response(body, etag=None):
+    response = Response(body, mimetype="application/json")
+    if etag:
+        # Weak, since compress_response may re-encode the same body
+        response.set_etag(etag, weak=True)
+        response = response.make_conditional(request)
+    return response
+
+
+def load_orders(connection, condition, limit=None):
+    # Plain rows instead of ORM objects, the API only needs to serialize them
+    orders = connection.execute(
+        select(Order.id, Order.user_id, Order.date, Order.status, Order.total_price)
+        .where(condition)
+        .order_by(Order.date.desc(), Order.id.desc())
+        .limit(limit)
+    ).all()
+
+    items = {}
+    if orders:
+        rows = connection.execute(
+            select(
+                OrderItem.order_id,
+                OrderItem.product_id,
+                Product.name,
+                OrderItem.quantity,
+                OrderItem.price,
+            )
+            # Deleted products keep their line items, with a null name
+            .outerjoin(Product)
+            .where(OrderItem.order_id.in_([order.id for order in orders]))
+            .order_by(OrderItem.id)
+        )
+        for row in rows:
+            items.setdefault(row.order_id, []).append(
+                {
+                    "product_id": row.product_id,
+                    "name": row.name,
+                    "quantity": row.quantity,
+                    "price": row.price,
+                }
+            )
+
+    return [
+        {
+            "id": order.id,
+            "user_id": order.user_id,
+            "date": order.date.isoformat(),
+            "status": order.status,
+            "total_price": order.total_price,
+            "items": items.get(order.id, []),
+        }
+        for order in orders
+    ]
+
+
+@app.route("/api/v1/menu")
+def api_menu():
+    global menu_cache
+    cached = menu_cache
+    if cached is None or cached[2] < time.monotonic():
+        generation = menu_generation
+        with Session(get_read_only_engine()) as db_session:
+            products = db_session.scalars(select(Product).order_by(Product.id)).all()
+            data = {
+                "products": [
+                    {
+                        "id": product.id,
+                        "name": product.name,
+                        "description": product.description,
+                        "price": product.price,
+                        "category": product.category,
+                        "in_stock": product.in_stock,
+                    }
+                    for product in products
+                ]
+            }
+        body = dump_json(data)
+        cached = (
+            body,
+            hashlib.md5(body).hexdigest(),
+            time.monotonic() + app.config["API_MENU_CACHE_SECONDS"],
+        )
+        with menu_cache_lock:
+            if generation == menu_generation:
+                menu_cache = cached
+
+    body, etag, _ = cached
+    response = api_response(body, etag=etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config["API_MENU_CACHE_SECONDS"]
+    return response
+
+
+@app.route("/api/v1/orders/<int:order_id>")
+@api_login_required
+def api_order(order_id):
+    with get_read_only_engine().connect() as connection:
+        orders = load_orders(connection, Order.id == order_id)
+    if not orders:
+        return jsonify({"error": "Order not found"}), 404
+    order = orders[0]
+    if order.pop("user_id") != current_user.id and not current_user.is_admin:
+        return jsonify({"error": "Order not found"}), 404
+    return api_response(dump_json(order))
+
+
+@app.route("/api/v1/me/orders")
+@api_login_required
+def api_my_orders():
+    limit = request.args.get("limit", app.config["API_ORDERS_PAGE_SIZE"], type=int)
+    limit = max(1, min(limit, app.config["API_ORDERS_MAX_PAGE_SIZE"]))
+    before = request.args.get("before", type=int)
+
+    with get_read_only_engine().connect() as connection:
+        condition = Order.user_id == current_user.id
+        if before is not None:
+            # Keyset cursor: everything after the given order in (date, id) order
+            cursor = connection.execute(
+                select(Order.date, Order.id).where(condition, Order.id == before)
+            ).first()
+            if not cursor:
+                return jsonify({"error": "Invalid cursor"}), 400
+            condition = and_(
+                condition,
+                or_(
+                    Order.date < cursor.date,
+                    and_(Order.date == cursor.date, Order.id < cursor.id),
+                ),
+            )
+        # One extra row tells whether there is a next page
+        orders = load_orders(connection, condition, limit=limit + 1)
+
+    next_before = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_before = orders[-1]["id"]
+    for order in orders:
+        del order["user_id"]
+    return api_response(dump_json({"orders": orders, "next_before": next_before}))
+
+
 def create_admin_user(phone, password, first_name, last_name):
     with app.app_context():  # Essential!
         existing_user = User.query.filter_by(phone_number=phone).first()